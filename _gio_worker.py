@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+# Helper process for gvfsh.py. When the shell's own interpreter has no
+# PyGObject, it starts this under one that does and sends it GIO queries, one
+# JSON object per line on stdin, answered one JSON object per line on stdout.
+
+import sys
+import json
+
+import gi
+gi.require_version("Gio", "2.0")
+from gi.repository import Gio, GLib
+
+def query_display_name(path):
+    info = Gio.File.new_for_path(path).query_info(
+        "standard::display-name", Gio.FileQueryInfoFlags.NONE, None
+    )
+    return info.get_display_name()
+
+def display_name(path):
+    return {"display_name": query_display_name(path)}
+
+def display_names(paths):
+    # Per-path [display_name, error], so one bad path does not sink the batch.
+    results = []
+    for path in paths:
+        try:
+            results.append([query_display_name(path), None])
+        except GLib.Error as e:
+            results.append([None, e.message])
+    return {"display_names": results}
+
+def list_children(path):
+    enumerator = Gio.File.new_for_path(path).enumerate_children(
+        "standard::name,standard::display-name,standard::type",
+        Gio.FileQueryInfoFlags.NONE,
+        None,
+    )
+    children = [
+        (info.get_name(), info.get_display_name(),
+         info.get_file_type() == Gio.FileType.DIRECTORY)
+        for info in enumerator
+    ]
+    enumerator.close(None)
+    return {"children": children}
+
+OPS = {"info": display_name, "info_many": display_names, "list": list_children}
+
+def main():
+    print(json.dumps({"ready": True}), flush=True)
+    for line in sys.stdin:
+        request = json.loads(line)
+        try:
+            reply = OPS[request.pop("op")](**request)
+        except GLib.Error as e:
+            reply = {"error": e.message}
+        print(json.dumps(reply), flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,20 @@
 import os
 import sys
 import shlex
+import shutil
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
 
+from gvfsh_core import (
+    GIO, Gio, GLib, GioError, PRELOAD_DEPTH,
+    completer, display_path_of, get_display_name, gfile_for,
+    invalidate_dir, list_dir, load_name_db, prefetch_dir, resolve_name, start_preload,
+)
+
 import readline
 readline.parse_and_bind("tab: complete")
 
@@ -14,217 +25,213 @@ ROOT = next(GVFS_BASE.glob("google-drive:*"), None)
 if not ROOT:
     print("No Google Drive mount found in GVFS.")
     sys.exit(1)
+if not GIO:
+    print("[FATAL] 'gio' not found in PATH. Install 'gvfs' and 'glib2'.")
+    sys.exit(1)
+
+def copy_file(src, dst):
+    # cp for one file, minus the fork: shutil uses sendfile() where it can.
+    if dst.is_dir():
+        dst = dst / src.name
+    shutil.copyfile(src, dst)
+    return dst
 
-current_path = ROOT
+def gio_copy(src, dst):
+    if Gio is not None:
+        try:
+            gfile_for(src).copy(
+                Gio.File.new_for_path(str(dst)), Gio.FileCopyFlags.OVERWRITE, None, None, None
+            )
+        except GLib.Error as e:
+            raise GioError(e.message)
+        return
 
-def get_display_name(path):
     try:
-        output = subprocess.check_output(["gio", "info", str(path)], text=True)
-        for line in output.splitlines():
-            line = line.strip()
-            if line.startswith("standard::display-name:"):
-                return line.replace("standard::display-name:", "").strip()
+        subprocess.run([GIO, "copy", str(src), str(dst)], check=True)
     except subprocess.CalledProcessError as e:
-        print(f"[ERROR] Failed to run gio info on {path}:\n{e}")
-        return None
-    except FileNotFoundError:
-        print("[FATAL] 'gio' not found in PATH. Install 'gvfs' and 'glib2'.")
-        sys.exit(1)
-
-def list_dir(path, mapping_store=None, silent=False):
-    entries = list(path.iterdir())
-    mapping = {}
-    for entry in entries:
-        display_name = get_display_name(entry)
-        if display_name:
-            mapping[display_name] = entry
-    if not silent:
-        for name in sorted(mapping):
-            print(name)
-    if mapping_store is not None:
-        mapping_store.clear()
-        mapping_store.update(mapping)
-    return mapping
-
-def completer(text, state):
-    # Combine GVFS display names and system filenames
-    matches = []
-
+        raise GioError(str(e))
+
+def copy_into_gvfs(src, dst):
+    dst = copy_file(src, dst)
+    invalidate_dir(dst.parent)
+    return f"Copied {src} → {dst}"
+
+def copy_out_of_gvfs(src, dst):
+    gio_copy(src, dst)
+    return f"Copied {src} → {dst} via gio"
+
+class CopyEngine:
+    # Runs cp jobs in the background so the prompt comes straight back.
+    MAX_PARALLEL = 8
+
+    def __init__(self):
+        self._pool = ThreadPoolExecutor(max_workers=self.MAX_PARALLEL)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._next_id = 1
+
+    def submit(self, copy, src, dst):
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            self._jobs[job_id] = ["queued", src, dst]
+        print(f"[{job_id}] queued: {src} → {dst}")
+        self._pool.submit(self._run, job_id, copy, src, dst)
+
+    def _run(self, job_id, copy, src, dst):
+        with self._lock:
+            self._jobs[job_id][0] = "running"
+        try:
+            result = copy(src, dst)
+        except (OSError, GioError) as e:
+            result = f"cp: failed: {e}"
+        finally:
+            # Gone from `jobs` before its result is printed.
+            with self._lock:
+                del self._jobs[job_id]
+        print(f"\n[{job_id}] {result}")
+
+    def jobs(self):
+        with self._lock:
+            return sorted((job_id, *job) for job_id, job in self._jobs.items())
+
+    def wait(self):
+        self._pool.shutdown(wait=True)
+
+copy_engine = CopyEngine()
+
+@dataclass
+class ShellState:
+    # Declared by hand rather than slots=True, which needs Python 3.10.
+    __slots__ = ("current", "stack", "names")
+    current: Path
+    stack: list
+    names: dict
+
+def entered(state):
+    state.current = state.stack[-1]
+    prefetch_dir(state.current)
+
+def cmd_exit(args, state):
+    return True
+
+def cmd_ls(args, state):
+    list_dir(state.current, state.names)
+
+def cmd_cd(args, state):
+    if not args:
+        print("cd: missing argument")
+        return
+
+    target = args[0].strip()
+    if target == "..":
+        if len(state.stack) > 1:
+            state.stack.pop()
+            entered(state)
+        return
+
+    # Refresh mapping before resolving target
+    state.names.clear()
+    list_dir(state.current, state.names, silent=True)
+
+    if target in state.names:
+        state.stack.append(state.names[target])
+        entered(state)
+    else:
+        print(f"cd: no such file or directory: {target}")
+
+def cmd_mkdir(args, state):
+    if not args:
+        print("mkdir: missing argument")
+        return
+
+    dir_name = args[0].strip()
+    mapping = list_dir(state.current, silent=True)
+    if dir_name in mapping:
+        print(f"mkdir: directory already exists: {dir_name}")
+        return
+
+    new_dir = state.current / dir_name
     try:
-        # Local dir matches (real FS)
-        real_matches = [f for f in os.listdir('.') if f.startswith(text)]
-        matches.extend(real_matches)
-    except Exception:
-        pass
-
+        new_dir.mkdir()
+        invalidate_dir(state.current)
+        print(f"Created directory: {dir_name}")
+    except Exception as e:
+        print(f"mkdir: failed: {e}")
+
+def cmd_cp(args, state):
+    if len(args) != 2:
+        print("cp: usage: cp <src> <dst>")
+        return
+
+    src_arg, dst_arg = args
+    src_path = Path(src_arg)
+
+    if src_path.is_absolute() and src_path.exists():
+        # Local filesystem → GVFS
+        dst = resolve_name(state.current, dst_arg)
+        if dst is None:
+            dst = state.current / dst_arg  # Assume creating a new file
+        copy_engine.submit(copy_into_gvfs, src_path, dst)
+        return
+
+    # GVFS file → something
+    src = resolve_name(state.current, src_arg)
+    if src is None:
+        print(f"cp: no such file: {src_arg}")
+        return
+
+    if dst_arg.startswith("/"):
+        # GVFS → real filesystem
+        dst_path = Path(dst_arg)
+        if dst_path.is_dir():
+            display_name = get_display_name(src)
+            if display_name:
+                dst_path = dst_path / display_name
+        copy_engine.submit(copy_out_of_gvfs, src, dst_path)
+    else:
+        # GVFS → GVFS
+        dst = state.current / dst_arg
+        copy_engine.submit(copy_into_gvfs, src, dst)
+
+def cmd_jobs(args, state):
+    jobs = copy_engine.jobs()
+    if not jobs:
+        print("No copies in flight")
+    for job_id, status, src, dst in jobs:
+        print(f"[{job_id}] {status}: {src} → {dst}")
+
+def cmd_pwd(args, state):
+    print(display_path_of(state.stack))
+
+def cmd_clear(args, state):
+    os.system("clear")
+
+def cmd_info(args, state):
+    if not args:
+        print("info: missing argument")
+        return
+
+    target = args[0].strip()
+    mapping = list_dir(state.current, silent=True)
+    if target not in mapping:
+        print(f"info: no such file: {target}")
+        return
+
+    target_path = mapping[target]
     try:
-        # GVFS display name matches
-        mapping = list_dir(current_path, silent=True)
-        gvfs_matches = [name for name in mapping if name.startswith(text)]
-        matches.extend(gvfs_matches)
-    except Exception:
-        pass
-
-    matches = sorted(set(matches))
-    if state < len(matches):
-        return matches[state]
-    return None
-
-
-def repl():
-    global current_path
-    path_stack = [current_path]
-    name_to_path = {}
-
-    while True:
-        try:
-            display_path = []
-            for p in path_stack[1:]:  # Skip root
-                name = get_display_name(p)
-                display_path.append(name if name else p.name)
-            prompt_path = "/" + "/".join(display_path) if display_path else "/"
-            cmd_input = input(f"[gvfsh] {prompt_path} > ")
-        except EOFError:
-            break
-
-        parts = shlex.split(cmd_input.strip())
-        if not parts:
-            continue
-
-        cmd = parts[0]
-        args = parts[1:]
-
-        if cmd == "exit":
-            break
-
-        elif cmd == "ls":
-            mapping = list_dir(current_path, name_to_path)
-
-        elif cmd == "cd":
-            if not args:
-                print("cd: missing argument")
-                continue
-
-            target = args[0].strip()
-            if target == "..":
-                if len(path_stack) > 1:
-                    path_stack.pop()
-                    current_path = path_stack[-1]
-                continue
-
-            # Refresh mapping before resolving target
-            name_to_path.clear()
-            mapping = list_dir(current_path, name_to_path, silent=True)
-
-            if target in name_to_path:
-                new_path = name_to_path[target]
-                path_stack.append(new_path)
-                current_path = new_path
-            else:
-                print(f"cd: no such file or directory: {target}")
-
-        elif cmd == "mkdir":
-            if not args:
-                print("mkdir: missing argument")
-                continue
-
-            dir_name = args[0].strip()
-            mapping = list_dir(current_path, silent=True)
-            if dir_name in mapping:
-                print(f"mkdir: directory already exists: {dir_name}")
-                continue
-
-            new_dir = current_path / dir_name
-            try:
-                new_dir.mkdir()
-                print(f"Created directory: {dir_name}")
-            except Exception as e:
-                print(f"mkdir: failed: {e}")
-
-
-        elif cmd == "cp":
-            if len(args) != 2:
-                print("cp: usage: cp <src> <dst>")
-                continue
-
-            src_arg, dst_arg = args
-            src_path = Path(src_arg)
-            mapping = list_dir(current_path, silent=True)
-
-            if src_path.is_absolute() and src_path.exists():
-                # Local filesystem → GVFS
-                dst = mapping.get(dst_arg)
-                if dst is None:
-                    dst = current_path / dst_arg  # Assume creating a new file
-                try:
-                    subprocess.run(["cp", str(src_path), str(dst)], check=True)
-                    print(f"Copied {src_path} → {dst}")
-                except subprocess.CalledProcessError as e:
-                    print(f"cp: failed: {e}")
-            else:
-                # GVFS file → something
-                src = mapping.get(src_arg)
-                if src is None:
-                    print(f"cp: no such file: {src_arg}")
-                    continue
-
-                if dst_arg.startswith("/"):
-                    # GVFS → real filesystem
-                    dst_path = Path(dst_arg)
-                    if dst_path.is_dir():
-                        display_name = get_display_name(src)
-                        if display_name:
-                            dst_path = dst_path / display_name
-                    try:
-                        subprocess.run(["gio", "copy", str(src), str(dst_path)], check=True)
-                        print(f"Copied {src} → {dst_path} via gio")
-                    except subprocess.CalledProcessError as e:
-                        print(f"gio cp failed: {e}")
-                else:
-                    # GVFS → GVFS
-                    dst = current_path / dst_arg
-                    try:
-                        subprocess.run(["cp", str(src), str(dst)], check=True)
-                        print(f"Copied {src} → {dst}")
-                    except subprocess.CalledProcessError as e:
-                        print(f"cp: failed: {e}")
-
-                
-
-        elif cmd == "pwd":
-            display_path = []
-            for p in path_stack[1:]:  # Skip the root '/'
-                name = get_display_name(p)
-                display_path.append(name if name else str(p.name))
-            print("/" + "/".join(display_path) if display_path else "/")
-
-        elif cmd == "clear":
-            os.system("clear")
-
-        elif cmd == "info":
-            if not args:
-                print("info: missing argument")
-                continue
-
-            target = args[0].strip()
-            mapping = list_dir(current_path, silent=True)
-            if target not in mapping:
-                print(f"info: no such file: {target}")
-                continue
-
-            target_path = mapping[target]
-            try:
-                output = subprocess.check_output(["gio", "info", str(target_path)], text=True)
-                print(output)
-            except subprocess.CalledProcessError as e:
-                print(f"[ERROR] Failed to get info on {target_path}:\n{e}")
+        # gio writes straight to our stdout; nothing to buffer or re-print.
+        subprocess.run([GIO, "info", str(target_path)], check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"[ERROR] Failed to get info on {target_path}:\n{e}")
 
-        elif cmd == "help":
-            print("""
+def cmd_help(args, state):
+    print("""
             Available commands:
             ls               - List contents of the current directory
             cd <name>        - Change directory by display name (quoted if needed)
-            cp <src> <dest>  - Copy files (real ↔ GVFS, or GVFS ↔ real)
+            cp <src> <dest>  - Copy files (real ↔ GVFS, or GVFS ↔ real) in the background
+            jobs             - List copies that are still queued or running
             pwd              - Show current human-readable path
             help             - Show this help message
             exit             - Exit gvfsh like a responsible adult
@@ -238,8 +245,46 @@ def repl():
             - Tab completion should work too.
             """)
 
+# Handlers take (args, state); a truthy return ends the REPL.
+HANDLERS = {
+    "exit": cmd_exit,
+    "ls": cmd_ls,
+    "cd": cmd_cd,
+    "mkdir": cmd_mkdir,
+    "cp": cmd_cp,
+    "jobs": cmd_jobs,
+    "pwd": cmd_pwd,
+    "clear": cmd_clear,
+    "info": cmd_info,
+    "help": cmd_help,
+}
+
+def repl(state):
+    while True:
+        try:
+            cmd_input = input(f"[gvfsh] {display_path_of(state.stack)} > ")
+        except EOFError:
+            break
+
+        # Only quotes and backslashes need shlex; plain ASCII words split the
+        # same in C. str.split() would also break on NBSP and other Unicode
+        # spaces, which shlex leaves inside a name.
+        cmd_input = cmd_input.strip()
+        if not cmd_input.isascii() or any(c in cmd_input for c in "\"'\\"):
+            parts = shlex.split(cmd_input)
         else:
+            parts = cmd_input.split()
+        if not parts:
+            continue
+
+        cmd = parts[0]
+        args = parts[1:]
+
+        handler = HANDLERS.get(cmd)
+        if handler is None:
             print(f"{cmd}: command not found")
+        elif handler(args, state):
+            break
 
 
 if __name__ == "__main__":
@@ -250,6 +295,9 @@ if __name__ == "__main__":
     Usage:
     ./gvfsh.py           Launch interactive shell
     ./gvfsh.py --help    Show this message and exit
+    ./gvfsh.py --max-preload-depth=N
+                         Preload display names N levels deep at startup
+                         (default 2, 0 disables)
 
     Requirements:
     - Google Drive mounted via GVFS (e.g. Nautilus)
@@ -262,7 +310,21 @@ if __name__ == "__main__":
     """)
         sys.exit(0)
 
-    readline.set_completer(completer)
+    preload_depth = PRELOAD_DEPTH
+    for arg in sys.argv[1:]:
+        if arg.startswith("--max-preload-depth="):
+            try:
+                preload_depth = int(arg.split("=", 1)[1])
+            except ValueError:
+                print(f"Invalid preload depth: {arg}")
+                sys.exit(2)
+
+    load_name_db()
+    start_preload(ROOT, preload_depth)
+    state = ShellState(ROOT, [ROOT], {})
+    readline.set_completer(partial(completer, state))
     print("Welcome to GVFS-Shell — CLI navigation of Google Drive")
-    repl()
-
+    repl(state)
+    if copy_engine.jobs():
+        print("Waiting for background copies to finish...")
+    copy_engine.wait()
@@ -0,0 +1,661 @@
+# Display-name lookups, listing caches and Tab completion for gvfsh.py.
+# Kept apart from the REPL and fully annotated so it can be compiled with
+# `mypyc gvfsh_core.py`; Python imports the built extension ahead of this
+# file when it exists and falls back to this file when it does not.
+
+import os
+import sys
+import atexit
+import json
+import shutil
+import sqlite3
+import subprocess
+import time
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from urllib.parse import unquote
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import gi  # type: ignore
+    gi.require_version("Gio", "2.0")
+    from gi.repository import Gio, GLib  # type: ignore
+except (ImportError, ValueError):
+    # PyGObject is optional; without it we shell out to the gio CLI.
+    Gio = GLib = None
+
+# (name, display_name, is_dir) for one directory entry.
+Child = Tuple[str, str, bool]
+
+# Directory listings are reused for this long before gio is asked again.
+DIR_CACHE_TTL = 10.0
+_dir_cache: Dict[str, Tuple[float, Dict[str, Path]]] = {}
+# Directories whose entries all had display name == name when gio last
+# listed them, with when that was seen. Within PLAIN_DIR_TTL they are
+# listed with a plain readdir instead of asking gio.
+PLAIN_DIR_TTL = 5 * 60.0
+_plain_dirs: Dict[str, float] = {}
+# Upper bound on concurrent per-entry lookups when a bulk listing fails.
+MAX_LOOKUP_WORKERS = 16
+# Display names learned from listings, keyed by path string.
+_name_cache: Dict[str, str] = {}
+# Names learned this session, written to NAME_DB_PATH at exit.
+_names_to_persist: Dict[str, Tuple[str, float]] = {}
+NAME_DB_PATH = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "gvfsh" / "names.sqlite"
+# Persisted names older than this are ignored and pruned.
+NAME_DB_TTL = 24 * 60 * 60
+# Directory listings from earlier sessions with the directory's mtime when
+# listed; each serves the first get_mapping of its directory if the mtime
+# still matches. Listings made this session are written at exit.
+_persisted_listings: Dict[str, Tuple[float, List[Child]]] = {}
+_listings_to_persist: Dict[str, Tuple[float, List[Child], float]] = {}
+# How many levels below ROOT are walked at startup; --max-preload-depth=N.
+PRELOAD_DEPTH = 2
+
+class GioError(Exception):
+    pass
+
+@lru_cache(maxsize=4096)
+def gfile_for(path: Path) -> Any:
+    return Gio.File.new_for_path(str(path))
+
+# Resolved once here rather than on every exec; empty when gio is missing,
+# which gvfsh.py refuses to start with.
+GIO = shutil.which("gio") or ""
+
+# Interpreter for _gio_worker.py when ours lacks PyGObject; distro Pythons
+# usually ship python3-gi even when a venv or conda Python does not.
+WORKER_PYTHON = "/usr/bin/python3"
+
+def worker_script() -> Path:
+    # Looked up once imported: a mypyc build's own __file__ is the source path
+    # relative to wherever it was compiled, but the module's attribute is real.
+    module_file = sys.modules[__name__].__file__
+    assert module_file is not None
+    return Path(module_file).resolve().parent / "_gio_worker.py"
+
+# The helper's stderr, so a crash leaves a traceback somewhere.
+WORKER_LOG = NAME_DB_PATH.parent / "gio_worker.log"
+
+class GioWorker:
+    # One long-lived helper process answering GIO queries over a pipe.
+
+    def __init__(self, proc: "subprocess.Popen[str]") -> None:
+        self._proc = proc
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls) -> Optional["GioWorker"]:
+        try:
+            WORKER_LOG.parent.mkdir(parents=True, exist_ok=True)
+            with open(WORKER_LOG, "w") as log:
+                proc = subprocess.Popen(
+                    [WORKER_PYTHON, "-u", str(worker_script())],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=log,
+                    text=True,
+                )
+        except OSError:
+            return None
+        # The worker exits without greeting if it cannot import gi.
+        assert proc.stdout is not None
+        if not proc.stdout.readline():
+            proc.wait()
+            return None
+        return cls(proc)
+
+    def request(self, op: str, **args: Any) -> Optional[Dict[str, Any]]:
+        # None means the helper has died; callers then fall back to the gio CLI.
+        assert self._proc.stdin is not None and self._proc.stdout is not None
+        with self._lock:
+            try:
+                self._proc.stdin.write(json.dumps({"op": op, **args}) + "\n")
+                self._proc.stdin.flush()
+                line = self._proc.stdout.readline()
+            except OSError:
+                line = ""
+        if not line:
+            self._retire()
+            return None
+        reply: Dict[str, Any] = json.loads(line)
+        if "error" in reply:
+            raise GioError(reply["error"])
+        return reply
+
+    def _retire(self) -> None:
+        with _worker_lock:
+            if _worker_state["worker"] is not self:
+                return  # Another thread already noticed.
+            # "started" stays set, so the helper is not respawned.
+            _worker_state["worker"] = None
+        try:
+            status = self._proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            status = self._proc.wait()
+        print(f"[ERROR] gio helper exited with status {status}, using the gio CLI from now on"
+              f" (helper output in {WORKER_LOG})")
+
+_worker_state: Dict[str, Any] = {"worker": None, "started": False}
+_worker_lock = threading.Lock()
+
+def gio_worker() -> Optional[GioWorker]:
+    # Started on first use; None when unavailable, and then never retried.
+    if Gio is not None:
+        return None
+    with _worker_lock:
+        if not _worker_state["started"]:
+            _worker_state["worker"] = GioWorker.start()
+            _worker_state["started"] = True
+        worker: Optional[GioWorker] = _worker_state["worker"]
+        return worker
+
+@lru_cache(maxsize=4096)
+def _display_name_cached(path_str: str) -> Optional[str]:
+    # Failures raise GioError, which lru_cache does not memoize.
+    if Gio is not None:
+        try:
+            info = gfile_for(Path(path_str)).query_info(
+                "standard::display-name", Gio.FileQueryInfoFlags.NONE, None
+            )
+            display_name: str = info.get_display_name()
+            return display_name
+        except GLib.Error as e:
+            raise GioError(f"Failed to query info on {path_str}:\n{e.message}")
+
+    worker = gio_worker()
+    if worker is not None:
+        try:
+            reply = worker.request("info", path=path_str)
+        except GioError as e:
+            raise GioError(f"Failed to query info on {path_str}:\n{e}")
+        if reply is not None:
+            return reply["display_name"]
+
+    try:
+        output = subprocess.check_output(
+            [GIO, "info", "-a", "standard::display-name", path_str],
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+    except subprocess.CalledProcessError as e:
+        raise GioError(f"Failed to run gio info on {path_str}:\n{e.stderr.strip() or e}")
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("standard::display-name:"):
+            return line.replace("standard::display-name:", "").strip()
+    return None
+
+def remember_name(path_str: str, display_name: str) -> None:
+    _name_cache[path_str] = display_name
+    _names_to_persist[path_str] = (display_name, time.time())
+
+def lookup_display_name(path: Path) -> Optional[str]:
+    # get_display_name without the reporting, for background threads; raises GioError.
+    key = str(path)
+    display_name = _name_cache.get(key)
+    if display_name is not None:
+        return display_name
+    display_name = _display_name_cached(key)
+    if display_name is not None:
+        remember_name(key, display_name)
+    return display_name
+
+def get_display_name(path: Path) -> Optional[str]:
+    try:
+        return lookup_display_name(path)
+    except GioError as e:
+        print(f"[ERROR] {e}")
+        return None
+
+def _query_display_names(
+    path_strs: List[str],
+) -> Iterator[Tuple[str, Optional[str], Optional[GioError]]]:
+    # One round trip for all of path_strs; yields (path_str, display_name, error).
+    if Gio is not None:
+        for path_str in path_strs:
+            try:
+                yield path_str, _display_name_cached(path_str), None
+            except GioError as e:
+                yield path_str, None, e
+        return
+
+    worker = gio_worker()
+    reply = worker.request("info_many", paths=path_strs) if worker is not None else None
+    if reply is not None:
+        for path_str, (display_name, error) in zip(path_strs, reply["display_names"]):
+            if error is not None:
+                yield path_str, None, GioError(f"Failed to query info on {path_str}:\n{error}")
+            else:
+                yield path_str, display_name, None
+        return
+
+    # gio info takes several locations and prints one record per file,
+    # each with its "local path:" ahead of the attributes. That label is
+    # translated, hence C.UTF-8: untranslated messages, but paths and names
+    # still come out as UTF-8 rather than as "?".
+    proc = subprocess.Popen(
+        [GIO, "info", "-a", "standard::display-name", *path_strs],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        encoding="utf-8",
+        errors="surrogateescape",
+        env={**os.environ, "LC_ALL": "C.UTF-8"},
+    )
+    # communicate() drains both pipes, so a long run of errors cannot stall gio.
+    output, errors = proc.communicate()
+    found: Dict[str, str] = {}
+    current: Optional[str] = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("local path:"):
+            current = line.replace("local path:", "", 1).strip()
+        elif line.startswith("standard::display-name:") and current is not None:
+            found[current] = line.replace("standard::display-name:", "", 1).strip()
+    # Each error line starts "gio: file://<uri>: "; the URI escapes spaces,
+    # so the first ": " ends it. Matched exactly, as the ancestors of a
+    # prompt batch are prefixes of one another.
+    failed: Dict[str, List[str]] = {}
+    for line in errors.splitlines():
+        uri, sep, _ = line.partition(": ")[2].partition(": ")
+        if sep and uri.startswith("file://"):
+            failed.setdefault(
+                unquote(uri[len("file://"):], errors="surrogateescape"), []
+            ).append(line)
+    status = f" (exit status {proc.returncode})" if proc.returncode else ""
+    for path_str in path_strs:
+        if path_str in found:
+            yield path_str, found[path_str], None
+        else:
+            detail = "\n".join(failed.get(path_str, []))
+            yield path_str, None, GioError(
+                f"Failed to run gio info on {path_str}{status}" + (f":\n{detail}" if detail else "")
+            )
+
+def get_display_names(paths: List[Path]) -> List[Optional[str]]:
+    # Like get_display_name for each of paths, but misses share one query.
+    names: Dict[str, Optional[str]] = {}
+    missing: List[str] = []
+    for path in paths:
+        key = str(path)
+        if key in _name_cache:
+            names[key] = _name_cache[key]
+        else:
+            missing.append(key)
+    if missing:
+        for key, display_name, error in _query_display_names(missing):
+            if error is not None:
+                print(f"[ERROR] {error}")
+            elif display_name is not None:
+                remember_name(key, display_name)
+            names[key] = display_name
+    return [names[str(path)] for path in paths]
+
+def open_name_db() -> sqlite3.Connection:
+    NAME_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(str(NAME_DB_PATH))
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS names ("
+        "path TEXT PRIMARY KEY, display_name TEXT NOT NULL, fetched_at REAL NOT NULL)"
+    )
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS listings ("
+        "path TEXT PRIMARY KEY, mtime REAL NOT NULL, children TEXT NOT NULL, fetched_at REAL NOT NULL)"
+    )
+    return db
+
+def load_name_db() -> None:
+    # Warm _name_cache and _persisted_listings from the previous sessions and
+    # save this one's at exit.
+    try:
+        db = open_name_db()
+        rows = db.execute(
+            "SELECT path, display_name FROM names WHERE fetched_at > ?",
+            (time.time() - NAME_DB_TTL,),
+        )
+        _name_cache.update(rows)
+        rows = db.execute(
+            "SELECT path, mtime, children FROM listings WHERE fetched_at > ?",
+            (time.time() - NAME_DB_TTL,),
+        )
+        for path_str, mtime, children in rows:
+            _persisted_listings[path_str] = (
+                mtime, [(name, display_name, is_dir) for name, display_name, is_dir in json.loads(children)]
+            )
+    except (OSError, sqlite3.Error) as e:
+        print(f"[ERROR] Name cache {NAME_DB_PATH} unavailable: {e}")
+        return
+    atexit.register(save_name_db, db)
+
+def save_name_db(db: sqlite3.Connection) -> None:
+    # Background threads may still be adding names, so work on a copy.
+    pending = _names_to_persist.copy()
+    listings = _listings_to_persist.copy()
+    try:
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO names VALUES (?, ?, ?)",
+                ((path, name, fetched_at) for path, (name, fetched_at) in pending.items()),
+            )
+            db.executemany(
+                "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?)",
+                ((path, mtime, json.dumps(children), fetched_at)
+                 for path, (mtime, children, fetched_at) in listings.items()),
+            )
+            db.execute("DELETE FROM names WHERE fetched_at <= ?", (time.time() - NAME_DB_TTL,))
+            db.execute("DELETE FROM listings WHERE fetched_at <= ?", (time.time() - NAME_DB_TTL,))
+        db.close()
+    except sqlite3.Error as e:
+        print(f"[ERROR] Failed to save name cache {NAME_DB_PATH}: {e}")
+
+DISPLAY_NAME_FIELD = "\tstandard::display-name="
+
+def parse_list_line(line: str) -> Tuple[Optional[str], Optional[str], bool]:
+    # <name>\t<size>\t(<type>)\tstandard::display-name=<display>
+    head, sep, display_name = line.rstrip("\n").partition(DISPLAY_NAME_FIELD)
+    if not sep:
+        return None, None, False
+    name, _, file_type = head.rsplit("\t", 2)
+    return name, display_name, file_type == "(directory)"
+
+def list_children(path: Path) -> List[Child]:
+    # Returns (name, display_name, is_dir) for every child of path from one bulk query.
+    if Gio is not None:
+        try:
+            enumerator = gfile_for(path).enumerate_children(
+                "standard::name,standard::display-name,standard::type",
+                Gio.FileQueryInfoFlags.NONE,
+                None,
+            )
+            children: List[Child] = [
+                (info.get_name(), info.get_display_name(),
+                 info.get_file_type() == Gio.FileType.DIRECTORY)
+                for info in enumerator
+            ]
+            enumerator.close(None)
+            return children
+        except GLib.Error as e:
+            raise GioError(f"Failed to enumerate {path}:\n{e.message}")
+
+    worker = gio_worker()
+    if worker is not None:
+        try:
+            reply = worker.request("list", path=str(path))
+        except GioError as e:
+            raise GioError(f"Failed to enumerate {path}:\n{e}")
+        if reply is not None:
+            return [(name, display_name, is_dir) for name, display_name, is_dir in reply["children"]]
+
+    # gio's complaints go to a file for the GioError, not over the prompt;
+    # a file rather than a pipe so it cannot fill up while we read stdout.
+    with tempfile.TemporaryFile("w+") as errors:
+        proc = subprocess.Popen(
+            [GIO, "list", "-h", "-a", "standard::display-name", str(path)],
+            stdout=subprocess.PIPE,
+            stderr=errors,
+            text=True,
+        )
+        assert proc.stdout is not None
+
+        # Parse line by line as gio writes, rather than buffering the whole listing.
+        children = []
+        with proc:
+            for line in proc.stdout:
+                name, display_name, is_dir = parse_list_line(line)
+                if name and display_name:
+                    children.append((name, display_name, is_dir))
+        if proc.returncode:
+            errors.seek(0)
+            detail = errors.read().strip()
+            error = subprocess.CalledProcessError(proc.returncode, proc.args)
+            raise GioError(f"Failed to run gio list on {path}:\n{detail or error}")
+    return children
+
+def list_children_each(
+    path: Path, lookup: Callable[[Path], Optional[str]] = get_display_name
+) -> List[Child]:
+    # Fallback for when the bulk query fails: one lookup per entry, overlapped.
+    with os.scandir(path) as it:
+        entries = [(entry.name, entry.is_dir()) for entry in it]
+    if not entries:
+        return []
+    with ThreadPoolExecutor(max_workers=min(MAX_LOOKUP_WORKERS, len(entries))) as ex:
+        names = list(ex.map(lookup, [path / name for name, _ in entries]))
+    return [(name, display_name, is_dir)
+            for (name, is_dir), display_name in zip(entries, names) if display_name]
+
+def list_plain_dir(path: Path) -> List[Child]:
+    # scandir's DirEntry answers is_dir() from d_type, without a stat per entry.
+    with os.scandir(path) as it:
+        return [(entry.name, entry.name, entry.is_dir()) for entry in it]
+
+def invalidate_dir(path: Path) -> None:
+    _dir_cache.pop(str(path), None)
+    _plain_dirs.pop(str(path), None)
+    _persisted_listings.pop(str(path), None)
+    _listings_to_persist.pop(str(path), None)
+
+def _query_children(path: Path, quiet: bool) -> List[Child]:
+    # The mtime is taken first, so a change made mid-listing makes it stale.
+    try:
+        mtime: Optional[float] = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+    try:
+        children = list_children(path)
+    except GioError as e:
+        try:
+            children = list_children_each(path, lookup_display_name if quiet else get_display_name)
+        except OSError:
+            raise e from None
+    if mtime is not None:
+        _listings_to_persist[str(path)] = (mtime, children, time.time())
+    return children
+
+def _persisted_children(path: Path) -> Optional[List[Child]]:
+    # A previous session's listing of path, if the directory is unchanged since.
+    persisted = _persisted_listings.pop(str(path), None)
+    if persisted is None:
+        return None
+    mtime, children = persisted
+    try:
+        if os.stat(path).st_mtime == mtime:
+            return children
+    except OSError:
+        pass
+    return None
+
+# Listings under way, by path, so that a command arriving while the
+# prefetch or the preload is listing the same directory waits for that
+# answer instead of asking gio a second time.
+_listings: Dict[str, "Future[List[Child]]"] = {}
+_listings_lock = threading.Lock()
+
+def fetch_children(path: Path, quiet: bool = False) -> List[Child]:
+    # list_children with the per-entry fallback, shared with any listing in flight.
+    key = str(path)
+    with _listings_lock:
+        pending = _listings.get(key)
+        if pending is None:
+            future: "Future[List[Child]]" = Future()
+            _listings[key] = future
+    if pending is not None:
+        try:
+            return pending.result()
+        except GioError:
+            if quiet:
+                raise
+            # A background listing failed without saying why; retry and report.
+            return _query_children(path, quiet)
+    try:
+        children = _query_children(path, quiet)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(children)
+    finally:
+        with _listings_lock:
+            del _listings[key]
+    return children
+
+def get_mapping(path: Path, quiet: bool = False) -> Dict[str, Path]:
+    # {display_name: path} for the children of path; raises GioError if unlistable.
+    # quiet is for background callers: a failed entry lookup raises rather than prints.
+    key = str(path)
+    cached = _dir_cache.get(key)
+    if cached and time.monotonic() - cached[0] < DIR_CACHE_TTL:
+        return cached[1]
+    persisted = _persisted_children(path)
+    if persisted is not None:
+        return remember_children(path, persisted, from_gio=False)
+    plain_since = _plain_dirs.get(key)
+    if plain_since is not None and time.monotonic() - plain_since < PLAIN_DIR_TTL:
+        try:
+            return remember_children(path, list_plain_dir(path), from_gio=False)
+        except OSError:
+            pass  # Let gio have a go and report the error.
+    return remember_children(path, fetch_children(path, quiet))
+
+def remember_children(path: Path, children: List[Child], from_gio: bool = True) -> Dict[str, Path]:
+    mapping = {}
+    plain = True
+    for name, display_name, _ in children:
+        child = path / name
+        mapping[display_name] = child
+        remember_name(str(child), display_name)
+        plain = plain and name == display_name
+    key = str(path)
+    now = time.monotonic()
+    _dir_cache[key] = (now, mapping)
+    # Only a real gio listing can tell whether the directory is plain, and
+    # an empty one tells us nothing about the entries it will get.
+    if from_gio:
+        if plain and children:
+            _plain_dirs[key] = now
+        else:
+            _plain_dirs.pop(key, None)
+    return mapping
+
+def list_dir(
+    path: Path, mapping_store: Optional[Dict[str, Path]] = None, silent: bool = False
+) -> Dict[str, Path]:
+    try:
+        mapping = get_mapping(path)
+    except GioError as e:
+        print(f"[ERROR] {e}")
+        mapping = {}
+    if not silent and mapping:
+        # One write and one stdout lock for the whole listing, not one per name.
+        sys.stdout.write("\n".join(sorted(mapping)) + "\n")
+    if mapping_store is not None:
+        mapping_store.clear()
+        mapping_store.update(mapping)
+    return mapping
+
+def resolve_name(path: Path, display_name: str) -> Optional[Path]:
+    # Any cached listing that has the name will do; only list afresh on a miss.
+    cached = _dir_cache.get(str(path))
+    if cached and display_name in cached[1]:
+        return cached[1][display_name]
+    return list_dir(path, silent=True).get(display_name)
+
+# A single background worker warms the listing of the directory we just
+# entered while the user is still typing the next command.
+_prefetch_executor = ThreadPoolExecutor(max_workers=1)
+_prefetch_state: Dict[str, Optional["Future[None]"]] = {"in_flight": None}
+
+def _prefetch(path: Path) -> None:
+    try:
+        get_mapping(path, quiet=True)
+    except GioError:
+        pass  # Reported by whichever command lists the directory next.
+
+def prefetch_dir(path: Path) -> None:
+    # Only the REPL thread submits, so no lock is needed around the state.
+    in_flight = _prefetch_state["in_flight"]
+    if in_flight is not None:
+        in_flight.cancel()
+    _prefetch_state["in_flight"] = _prefetch_executor.submit(_prefetch, path)
+
+def preload_tree(root: Path, max_depth: int) -> None:
+    # gio has no recursive listing, so walk breadth-first, one bulk query per directory.
+    level = [root]
+    for _ in range(max_depth):
+        next_level: List[Path] = []
+        for path in level:
+            try:
+                children = fetch_children(path, quiet=True)
+            except GioError:
+                continue
+            remember_children(path, children)
+            next_level.extend(path / name for name, _, is_dir in children if is_dir)
+        level = next_level
+
+def start_preload(root: Path, max_depth: int) -> None:
+    if max_depth > 0:
+        threading.Thread(target=preload_tree, args=(root, max_depth), daemon=True).start()
+
+def cached_mapping(path: Path) -> Dict[str, Path]:
+    # Whatever listing we already hold for path, stale or not; never queries gio.
+    cached = _dir_cache.get(str(path))
+    if cached is None:
+        prefetch_dir(path)
+        return {}
+    return cached[1]
+
+# Local completions are capped, and the names in "." are only re-read when
+# the working directory or its mtime changes.
+MAX_LOCAL_MATCHES = 256
+_local_names: Dict[str, Any] = {"key": None, "names": []}
+
+def local_matches(text: str) -> List[str]:
+    try:
+        key = (os.getcwd(), os.stat(".").st_mtime_ns)
+        if _local_names["key"] != key:
+            with os.scandir(".") as it:
+                _local_names["names"] = [e.name for e in it]
+            _local_names["key"] = key
+    except OSError:
+        return []
+    names: List[str] = _local_names["names"]
+    matching = (name for name in names if name.startswith(text))
+    return list(islice(matching, MAX_LOCAL_MATCHES))
+
+# Matches for the Tab press in progress; filled when readline passes state 0.
+_completion_matches: List[str] = []
+
+def completer(shell: Any, text: str, state: int) -> Optional[str]:
+    # shell is gvfsh.ShellState; it stays in the interpreted REPL module
+    # because mypyc native classes reject a hand-written __slots__.
+    # readline calls us with state 0, 1, 2, ... for one Tab press; only
+    # state 0 does any work, the rest index into the stored matches.
+    if state == 0:
+        # Combine system filenames with GVFS display names
+        matches = set(local_matches(text))
+        matches.update(name for name in cached_mapping(shell.current) if name.startswith(text))
+        _completion_matches[:] = sorted(matches)
+    if state < len(_completion_matches):
+        return _completion_matches[state]
+    return None
+
+# The human-readable path only changes on cd, so keep the last one around.
+_prompt_cache: Dict[str, Any] = {"stack_top": None, "text": "/"}
+
+def display_path_of(path_stack: List[Path]) -> str:
+    # The stack is a chain of parent -> child, so its top identifies all of it.
+    if _prompt_cache["stack_top"] != path_stack[-1]:
+        ancestors = path_stack[1:]  # Skip root
+        names = get_display_names(ancestors)
+        display_path = [name if name else p.name for p, name in zip(ancestors, names)]
+        _prompt_cache["text"] = "/" + "/".join(display_path) if display_path else "/"
+        _prompt_cache["stack_top"] = path_stack[-1]
+    text: str = _prompt_cache["text"]
+    return text